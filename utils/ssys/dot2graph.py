@@ -201,7 +201,7 @@ for i in ['tempus', 'aesria', 'flow', 'vean', 'nava']:
 newp = dict()
 for k in pos:
    if k[0] != '_' and (k in tradelane):
-      tln = [s for (s, _) in E[k] if (s in tradelane)]
+      tln = [s for s in E[k] if (s in tradelane)]
       if (n := len(tln)) > 1:
          p = sum([pos[s] for s in tln], vec())
          newp[k] = pos[k]*(1.0-n*0.125) + p*0.125
@@ -216,7 +216,7 @@ total = 0.0
 count = 0
 for k in pos:
    if k[0] != '_':
-      for n in [s for (s, _) in E[k] if (s in tradelane)]:
+      for n in [s for s in E[k] if (s in tradelane)]:
          total += (pos[n]-pos[k]).size()
          count += 1
 avg = total / count
@@ -224,7 +224,7 @@ avg = total / count
 for k in pos:
    if k[:3] == 'ngc' and k[3:] not in ['22375', '20489', '4746', '9415']:
       if len(n := E[k]) == 1:
-         n = n[0][0]
+         n = next(iter(n))
          v = pos[k] - pos[n]
          if v.size() < avg:
             pos[k] = pos[n] + v.normalize(avg)
@@ -2,8 +2,13 @@
 
 
 import os
+import re
 import sys
-import xml.etree.ElementTree as ET
+import mmap
+try:
+   from lxml import etree as ET
+except ImportError:
+   import xml.etree.ElementTree as ET
 from sys import argv, stderr
 
 getpath = lambda *x: os.path.realpath(os.path.join(*x))
@@ -28,27 +33,83 @@ cmd = getpath(script_dir, '..', 'repair_xml.sh')
 need_repair = []
 from atexit import register
 
-def fil_ET( name ):
-   T = ET.parse(name)
-   oldw = T.write
-   def write( nam ):
-      global need_repair
-      oldw(nam)
-      if need_repair == []:
-         def _repair_ET():
-            global need_repair
-            if need_repair != []:
-               subprocess.run([cmd] + need_repair)
-            need_repair = []
-         register(_repair_ET)
-      need_repair.append(nam)
-   T.write = write
-   return T
+def repair_ET():
+   global need_repair
+   if need_repair != []:
+      subprocess.run([cmd] + need_repair)
+   need_repair = []
+
+register(repair_ET)
+
+# Parses straight from a read-only mapping of the file, no intermediate copy.
+def parse_ET( name ):
+   with open(name, 'rb') as fp:
+      if os.fstat(fp.fileno()).st_size == 0:
+         return ET.parse(name)
+      with mmap.mmap(fp.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+         return ET.ElementTree(ET.fromstring(mm))
+
+_xy_re = re.compile(rb'(\s([xy])=")[^"]*(")')
+
+class fil_ET:
+   """
+   A parsed xml file. Files written through it are repaired by repair_ET,
+   at the latest at exit.
+
+   If splice is set, the caller only changes positions, through set_vec.
+   write then patches these attributes into the original bytes instead of
+   serializing the whole tree. It falls back to a full write whenever an
+   edited element can't be located (e.g. no lxml, so no sourceline).
+   """
+   def __init__( self, name, splice = False ):
+      if splice:
+         with open(name, 'rb') as fp:
+            self.raw = fp.read()
+         self.T = ET.ElementTree(ET.fromstring(self.raw))
+      else:
+         self.raw = None
+         self.T = parse_ET(name)
+      self.edited = []
+
+   def getroot( self ):
+      return self.T.getroot()
+
+   def set_vec( self, e, v ):
+      vec_to_element(e, v)
+      self.edited.append(e)
+
+   def _splice( self ):
+      lines = self.raw.splitlines(keepends = True)
+      for e in self.edited:
+         if (n := getattr(e, 'sourceline', None)) is None or n > len(lines):
+            return None
+         line = lines[n-1]
+         tag = re.compile(rb'<' + re.escape(e.tag.encode()) + rb'[\s/>][^>]*>')
+         if len(found := tag.findall(line)) != 1:
+            return None
+         val = {b'x': e.get('x').encode(), b'y': e.get('y').encode()}
+         new, count = _xy_re.subn(lambda m: m[1] + val[m[2]] + m[3], found[0])
+         if count != 2:
+            return None
+         lines[n-1] = line.replace(found[0], new)
+      return b''.join(lines)
+
+   def write( self, nam ):
+      # Write then rename, so that concurrent readers never see a partial file.
+      tmp = nam + '.tmp'
+      if self.raw is not None and (out := self._splice()) is not None:
+         with open(tmp, 'wb') as fp:
+            fp.write(out)
+      else:
+         with open(tmp, 'wb', buffering = 1<<20) as fp:
+            self.T.write(fp)
+         need_repair.append(nam)
+      os.replace(tmp, nam)
 
 class starmap(dict):
    def __missing__( self, key ):
       name = ssys_fil(key)
-      T = ET.parse(name).getroot()
+      T = parse_ET(name).getroot()
       if (e := T.find('pos')) is not None:
          try:
             self[key] = vec(float(e.attrib['x']), float(e.attrib['y']))
@@ -58,7 +119,7 @@ class starmap(dict):
       return self[key]
 
 def ssysneigh( sys ):
-   T = ET.parse(ssys_fil(sys)).getroot()
+   T = parse_ET(ssys_fil(sys)).getroot()
    acc = []
    count = 1
    for e in T.findall('./jumps/jump'):
@@ -4,7 +4,8 @@ if __name__ != '__main__':
    raise Exception('This module is only intended to be used as main.')
 
 
-from sys import argv, stderr
+from sys import argv, stderr, stdout
+import re
 
 from ssys_graph import xml_files_to_graph
 
@@ -62,24 +63,25 @@ virtual_edges = [
    ('ngc8338', 'unicorn'), ('ngc22375', 'undergate'),
 ]
 
+anbh_ids = [f'_{k}' for k in range(len(anbh) + 2)]
 prv, prvj  = None, None
 for j, i in enumerate(anbh):
    if prv is None:
       prv = i
    else:
       if prvj is not None:
-         virtual_edges.append(('_'+str(prvj),    '_'+str(j)))
+         virtual_edges.append((anbh_ids[prvj],  anbh_ids[j]))
       prvj = j
-      virtual_edges.append(('anubis_black_hole', '_'+str(j)))
-      virtual_edges.append(('_'+str(j),                 prv))
-      virtual_edges.append(('_'+str(j),                   i))
+      virtual_edges.append(('anubis_black_hole', anbh_ids[j]))
+      virtual_edges.append((anbh_ids[j],               prv))
+      virtual_edges.append((anbh_ids[j],                 i))
       prv = None
 
 if prv is not None:
    virtual_edges.append((prv,                           i))
-   virtual_edges.append(('_'+str(prvj),   '_'+str(prvj+2)))
-   virtual_edges.append(('_'+str(prvj+2),             prv))
-   virtual_edges.append(('_'+str(prvj+2),      '_'+str(1)))
+   virtual_edges.append((anbh_ids[prvj], anbh_ids[prvj+2]))
+   virtual_edges.append((anbh_ids[prvj+2],            prv))
+   virtual_edges.append((anbh_ids[prvj+2],    anbh_ids[1]))
 
 virtual_edges = [(t + (False, False))[:4] for t in virtual_edges]
 virtual_edges = [t[:2]+((t[2] or 1.0),)+t[3:] for t in virtual_edges]
@@ -91,86 +93,81 @@ for i in virtual_edges:
    else:
       already.add(i)
 
-def main( args, fixed_pos = False, color = False ):
+# Line breaks in labels: after '-', instead of ' ', except in "Test of".
+_label_re = re.compile(r'Test of|[- ]')
+_label_repl = {'-': '-\\n', ' ': '\\n', 'Test of': 'Test of'}
+
+# Yields the output lines.
+def _emit( args, fixed_pos = False, color = False ):
    V, pos, E, tl, colors = xml_files_to_graph(args, color)
-   print('graph g{')
-   print('\tepsilon=0.000001')
-   print('\tmaxiter=2000')
+   yield 'graph g{\n'
+   yield '\tepsilon=0.000001\n'
+   yield '\tmaxiter=2000\n'
 
    # 1inch=72pt
    if fixed_pos:
-      print('\tgraph [overlap=true]')
+      yield '\tgraph [overlap=true]\n'
       factor = 0.7
    else:
-      print('\tgraph [overlap=false]')  #'\toverlap=voronoi'
+      yield '\tgraph [overlap=false]\n'  #'\toverlap=voronoi'
       factor = 0.7
 
-   print('\tinputscale=72')
-   print('\tnotranslate=true') # don't make upper left at 0,0
-   print('\tnode[fixedsize=true,shape=circle,color=white,fillcolor=grey,style="filled"]')
+   yield '\tinputscale=72\n'
+   yield '\tnotranslate=true\n' # don't make upper left at 0,0
+   yield '\tnode[fixedsize=true,shape=circle,color=white,fillcolor=grey,style="filled"]\n'
    reflen = 0.5
-   print('\tnode[width=0.5]')
-   print('\tedge[len='+str(reflen)+']')
+   yield '\tnode[width=0.5]\n'
+   yield '\tedge[len=' + str(reflen) + ']\n'
 
    if fixed_pos:
-      print('\tnode[pin=true]')
+      yield '\tnode[pin=true]\n'
 
-   virt_v = set()
-   for e in virtual_edges:
-      if not e[3]:
-         virt_v.update(set([x for x in e[:2] if x not in V]))
+   virt_v = frozenset(x for e in virtual_edges if not e[3] for x in e[:2] if x not in V)
 
    if not fixed_pos:
       for i in sorted(virt_v):
-         if i not in V:
-            print('\t"' + i + '" [label="",style=invis]')
-
-   for i in V:
-      if i[0] == '_' and fixed_pos:
-         continue
-      # Don't include disconnected systems
-      if E[i] != [] or fixed_pos:
-         s = '\t"'+i+'" ['
-         if i[0] != '_':
-            (x, y) = pos[i]
-            x = round(float(x)*factor, 9)
-            y = round(float(y)*factor, 9)
-            s += 'pos="'+str(x)+','+str(y)+('!' if fixed_pos else '')+'";'
-         label = V[i]
-         for t in [('-','- '), (' ','\\n'), ('Test\\nof','Test of')]:
-            label = label.replace(*t)
-         s += 'label="' + label + '"'
-
-         if color:
-            cols = [int(255.0*(f/3.0+2.0/3.0)) for f in colors[i]]
-            rgb = ''.join([('0'+(hex(v)[2:]))[-2:] for v in cols])
-            s += ';fillcolor="#'+rgb+'"'
-
-         if i == 'sol':
-            s += ';color=red'
-
-         print(s + ']')
-         for dst, hid in E[i]:
-            suff = []
-            if (i, dst) in del_edges:
-               if fixed_pos:
-                  suff.append('color="red"')
-               else:
-                  continue
-            if i in tl and dst in tl:
-               suff.extend(['style=bold', 'penwidth=4.0'])
-            elif hid:
-               suff.extend(['style=dotted', 'penwidth=2.5'])
-
-            suff = '[' + ';'.join(suff) + ']' if suff != [] else ''
-
-            oneway = i not in map(lambda t:t[0], E[dst])
-            edge = '->' if oneway else '--'
-            if oneway or i<dst:
-               print('"'.join(['\t', i, edge, dst, suff]))
-
-   print('\tedge[len=' + str(reflen) + ']')
-   print('\tedge[style="dashed";color="grey";penwidth=1.5]')
+         yield '\t"' + i + '" [label="",style=invis]\n'
+
+   # Don't include disconnected systems
+   nodes = [i for i in V if i[0] != '_'] if fixed_pos else [i for i in V if E[i]]
+   for i in nodes:
+      s = '\t"'+i+'" ['
+      if i[0] != '_':
+         (x, y) = pos[i]
+         s += f'pos="{float(x)*factor:.9g},{float(y)*factor:.9g}' + ('!' if fixed_pos else '') + '";'
+      label = _label_re.sub(lambda m: _label_repl[m[0]], V[i])
+      s += 'label="' + label + '"'
+
+      if color:
+         cols = bytes(int(255.0*(f/3.0+2.0/3.0)) & 0xFF for f in colors[i])
+         rgb = cols.hex()
+         s += ';fillcolor="#'+rgb+'"'
+
+      if i == 'sol':
+         s += ';color=red'
+
+      yield s + ']\n'
+      for dst, hid in E[i].items():
+         suff = []
+         if (i, dst) in del_edges:
+            if fixed_pos:
+               suff.append('color="red"')
+            else:
+               continue
+         if i in tl and dst in tl:
+            suff.extend(['style=bold', 'penwidth=4.0'])
+         elif hid:
+            suff.extend(['style=dotted', 'penwidth=2.5'])
+
+         suff = f'[{";".join(suff)}]' if suff != [] else ''
+
+         oneway = i not in E[dst]
+         edge = '->' if oneway else '--'
+         if oneway or i<dst:
+            yield f'\t"{i}"{edge}"{dst}"{suff}\n'
+
+   yield '\tedge[len=' + str(reflen) + ']\n'
+   yield '\tedge[style="dashed";color="grey";penwidth=1.5]\n'
    for (f, t, l, v) in virtual_edges:
       prop = []
 
@@ -183,13 +180,13 @@ def main( args, fixed_pos = False, color = False ):
          continue
 
       if l != 1.0:
-         prop.append('len='+str(l*reflen))
+         prop.append(f'len={l*reflen:.9g}')
 
       prop = ';'.join(prop)
       if prop != '':
          prop = ' [' + prop + ']'
-      print('\t"' + f + '"--"' + t + '"' + prop)
-   print('}')
+      yield '\t"' + f + '"--"' + t + '"' + prop + '\n'
+   yield '}\n'
 
 if __name__ == '__main__':
    if '-h' in argv[1:] or '--help' in argv[1:] or len(argv)<2:
@@ -215,4 +212,5 @@ if __name__ == '__main__':
       if (ign := [f for f in argv[1:] if not f.endswith('.xml')]) != []:
          stderr.write('Ignored: "' + '", "'.join(ign) + '"\n')
 
-      main([f for f in argv[1:] if f.endswith('.xml')], keep, color)
+      stdout.reconfigure(write_through = False)
+      stdout.writelines(_emit([f for f in argv[1:] if f.endswith('.xml')], keep, color))
@@ -5,22 +5,50 @@ if __name__ != '__main__':
 
 
 from sys import argv, stdin, stderr, exit
+import numpy as np
 
 from ssys_graph import xml_files_to_graph, default_col
-from geometry import bb, vec
 
 
+SPHERE = """sphere{{
+   <{x}, {y}, 0>,
+   9.0
+   pigment {{color rgb<{rgb}>}}
+}}
+
+"""
+
+HALO = """cylinder{{
+   <0,0,-1>,
+   <0,0,0>,
+   0.7
+   pigment {{spherical turbulence 0.1 colour_map {{[0, rgbt <0,0,0,1>][1.0, rgbt<{rgb},0>]}}}}
+   scale 11*{radius}
+   translate <{x}, {y}, 3>
+}}
+
+"""
+
+JUMP = """cylinder{{
+   <{x}, {y}, 0>,
+   <{ox}, {oy}, 0>,
+   {width}
+   pigment {{color rgb<{rgb}>}}
+}}
+
+"""
+
 def main( args, pos = None, color = False, halo = False ):
-   dst = open('out.pov', 'w')
+   buf = []
 
    def write_pov(s, indent = -1):
       if hasattr(s, '__iter__') and not isinstance(s, str):
          for sub in s:
             write_pov(sub, indent+1)
       elif s.strip() == '':
-         dst.write('\n')
+         buf.append('\n')
       else:
-         dst.write(3*indent*' ' + str(s) + '\n')
+         buf.append(3*indent*' ' + str(s) + '\n')
 
    V, _pos, E, tradelane, colors = xml_files_to_graph(args, color)
    if pos is None or pos == {}:
@@ -28,20 +56,25 @@ def main( args, pos = None, color = False, halo = False ):
    else:
       V = {k: v for k, v in V.items() if k in pos}
 
-   b = bb()
-
-   for i in V:
-      pos[i] = vec(pos[i])
-      b += pos[i]
-
-   b *= 1.05
-   hs = b.size()/2
-   C = b.mini() + hs
+   names = list(V)
+   idx = {n: k for k, n in enumerate(names)}
+   P = np.array([pos[i] for i in names], dtype = np.float64)
+
+   # bounding box, enlarged by 1.05
+   lo, hi = P.min(0), P.max(0)
+   marg = (hi - lo) * (1.05 / 2.0)
+   lo, hi = lo - marg, hi + marg
+   hs = (hi - lo) / 2.0
+   C = lo + hs
+   P = -(P - C)
+   hs = hs.tolist()
    ratio = 1.0 * hs[0] / hs[1]
 
-   for i in V:
-      pos[i] -= C
-      pos[i] = -pos[i]
+   # all edge middles at once
+   edges = [(idx[i], idx[d]) for i in names for d in E[i]]
+   ei, ej = np.array(edges, dtype = np.intp).reshape(-1, 2).T
+   mids = iter(((P[ei] + P[ej]) / 2.0).tolist())
+   P = P.tolist()
 
    write_pov([ '',
       '#version 3.7;',
@@ -62,38 +95,26 @@ def main( args, pos = None, color = False, halo = False ):
       '',
    ])
    for i in V:
+      x, y = P[idx[i]]
       col = (0.5,0.5,0.5) if i not in colors else colors[i]
       if not (i == 'sol' and halo):
-         write_pov([ 'sphere{', [
-            '<' + str(pos[i][0]) + ', ' + str(pos[i][1]) + ', 0>,',
-            '9.0',
-            'pigment {color rgb<' + ','.join(map(str, col)) + '>}',
-         ], '}', '' ])
+         buf.append(SPHERE.format(x = x, y = y, rgb = ','.join(map(str, col))))
 
       if i == 'sol':
          col = (0.3,  0.0,  1.2)
 
       if halo and col != default_col:
          radius = '9' if i == 'sol' else '3'
-         write_pov([ 'cylinder{', [
-            '<0,0,-1>,',
-            '<0,0,0>,',
-            '0.7',
-            'pigment {spherical turbulence 0.1 colour_map {[0, rgbt <0,0,0,1>]' +
-               '[1.0, rgbt<' + ','.join(map(str,col)) + ',0>]}}',
-            'scale 11*' + radius,
-            'translate <' + str(pos[i][0]) + ', ' + str(pos[i][1]) + ', 3>',
-         ], '}', ''])
-      for dstsys, hid in E[i]:
-         other = (pos[i] + pos[dstsys]) / 2.0
-         write_pov([ 'cylinder{', [
-            '<' + str(pos[i][0]) + ', ' + str(pos[i][1]) + ', 0>,',
-            '<' + str(other[0]) + ', ' + str(other[1]) + ', 0>,',
-            str(2.9 if i in tradelane and dstsys in tradelane else 1.35),
-            'pigment {color rgb<' + ('0.5,0,0' if hid else '0.3,0.3,0.3') + '>}',
-         ], '}', '' ])
-
-   dst.close()
+         buf.append(HALO.format(x = x, y = y, radius = radius,
+            rgb = ','.join(map(str, col))))
+      for dstsys, hid in E[i].items():
+         ox, oy = next(mids)
+         buf.append(JUMP.format(x = x, y = y, ox = ox, oy = oy,
+            width = 2.9 if i in tradelane and dstsys in tradelane else 1.35,
+            rgb = '0.5,0,0' if hid else '0.3,0.3,0.3'))
+
+   with open('out.pov', 'w', buffering = 1<<20) as dst:
+      dst.write(''.join(buf))
 
    base = 1080
    cmd = [
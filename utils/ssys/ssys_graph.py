@@ -49,6 +49,7 @@ def all_ssys( args = None ):
          yield a[:-4], b
 
 # Vnames, Vpos, E, tradelane, color = xml_files_to_graph(args, use_color)
+# E[src] maps each dst to whether the jump is hidden.
 def xml_files_to_graph( args = None, get_colors = False ):
    name2id = dict()
    name, acc, pos, tradelane, color = [], [], [], set(), dict()
@@ -100,7 +101,7 @@ def xml_files_to_graph( args = None, get_colors = False ):
       count += 1
 
    ids = [name2id[x] for x in name]
-   acc = [[(name2id[t[0]],t[1]) for t in L] for L in acc]
+   acc = [{name2id[t]: h for t, h in L} for L in acc]
    return dict(zip(ids,name)), dict(pos), dict(zip(ids,acc)), tradelane, color
 
 
@@ -2,14 +2,55 @@
 
 
 from sys import stdout, stderr
-from os.path import basename
+from os.path import basename, getmtime, realpath
+from hashlib import sha1
+from functools import lru_cache
 from geometry import transf, vec
-from ssys import nam2base, starmap, fil_ET, spob_fil, vec_to_element, vec_from_element
+from ssys import nam2base, starmap, parse_ET, fil_ET, repair_ET, spob_fil, vec_from_element
 from math import sin, pi
 from minimize_angle_stretch import relax_dir
 
 sm = starmap()
 
+# Spob files are parsed once and written back by _flush_spobs.
+# path -> edited tree
+_spob_dirty = dict()
+
+@lru_cache(maxsize = 4096)
+def _spob_ET( spfil, _mtime ):
+   return fil_ET(spfil, splice = True)
+
+def _get_spob( spfil ):
+   return _spob_ET(spfil, getmtime(spfil))
+
+def _flush_spobs():
+   for spfil, p2 in sorted(_spob_dirty.items()):
+      p2.write(spfil)
+   _spob_dirty.clear()
+
+# Normalized starmap directions, (a, b) -> from a to b.
+_mapv_cache = dict()
+
+def _mapv( a, b ):
+   if (v := _mapv_cache.get((a, b))) is None:
+      if (v := _mapv_cache.get((b, a))) is not None:
+         v = -v
+      else:
+         v = (sm[b] - sm[a]).normalize()
+      _mapv_cache[(a, b)] = v
+   return v
+
+# relax_dir results, keyed by the rounded input directions.
+_relax_cache = dict()
+
+def _relax_dir( sysvs, mapvs, eps, debug = None, quiet = True ):
+   if debug is not None or not quiet:
+      return relax_dir(sysvs, mapvs, eps = eps, debug = debug, quiet = quiet)
+   rnd = lambda L: tuple((round(x, 6), round(y, 6)) for x, y in L)
+   key = (eps, rnd(sysvs), rnd(mapvs))
+   if (res := _relax_cache.get(key)) is None:
+      res = _relax_cache[key] = relax_dir(sysvs, mapvs, eps = eps, quiet = True)
+   return res
 
 def _key( v ):
    acc = 0
@@ -23,21 +64,52 @@ def mk_p( L ):
    where = pi.index(0)
    return pi[where:] + pi[:where]
 
-def ssys_relax( sys, quiet = True, graph = False ):
-   p = fil_ET(sys)
+# Is a equal to b with all but its first element reversed ?
+def _is_mirror( a, b ):
+   n = len(a)
+   return n == len(b) and a[0] == b[0] and all(a[i] == b[n-i] for i in range(1, n))
+
+# One walk over the ssys tree.
+# Returns (jumps, spobs, positions) where jumps are (jump, first pos or None)
+# pairs and positions are all the elements that have to be rotated along
+# with the system.
+def _ssys_elements( T ):
+   jumps, spobs, positions = [], [], []
+   for e in T:
+      if e.tag == 'jumps':
+         for f in e.iterfind('jump'):
+            pos = list(f.iterfind('pos'))
+            jumps.append((f, pos[0] if pos else None))
+            positions.extend(pos)
+      elif e.tag == 'spobs':
+         spobs.extend(e.iterfind('spob'))
+      elif e.tag == 'asteroids':
+         for f in e.iterfind('asteroid'):
+            positions.extend(f.iterfind('pos'))
+      elif e.tag == 'waypoints':
+         positions.extend(e.iterfind('waypoint'))
+   return jumps, spobs, positions
+
+# If deps is a list, the names of the ssys whose map position the result
+# depends on are appended to it.
+def ssys_relax( sys, quiet = True, graph = False, deps = None ):
+   p = fil_ET(sys, splice = True)
    T = p.getroot()
    myname = nam2base(T.attrib['name'])
+   jumps, spobs, positions = _ssys_elements(T)
 
    mapvs, sysvs, names = [], [], []
-   for f in T.findall('./jumps/jump'):
+   for f, e in jumps:
       dst = nam2base(f.attrib['target'])
-      e= f.find('pos')
       # should we require 'was_auto' ?
       if e is not None and 'was_auto' in e.attrib:
          names.append(dst)
-         mapvs.append((sm[dst] - sm[myname]).normalize())
+         mapvs.append(_mapv(myname, dst))
          sysvs.append(vec_from_element(e).normalize())
 
+   if deps is not None and names != []:
+      deps.extend([myname] + names)
+
    if names != []:
       nop = lambda v: v
       flip = nop
@@ -52,7 +124,7 @@ def ssys_relax( sys, quiet = True, graph = False ):
          # If only two jumps, we can flip to try improving the result.
          try_flipped, try_unflipped = (len(pi1) == 2), True
       else:
-         if pi1 == pi2[:1] + pi2[1:][::-1]:
+         if _is_mirror(pi1, pi2):
             wrn += [('2', '[flipped]')]
             try_flipped, try_unflipped = True, False
          else:
@@ -62,7 +134,7 @@ def ssys_relax( sys, quiet = True, graph = False ):
             try_flipped, try_unflipped = True, True
 
       if try_unflipped:
-         alpha, cost = relax_dir(sysvs, mapvs,
+         alpha, cost = _relax_dir(sysvs, mapvs,
             eps = eps/10.0, debug = out, quiet = quiet)
       else:
          alpha, cost = 360.0, 3.0
@@ -70,7 +142,7 @@ def ssys_relax( sys, quiet = True, graph = False ):
       if try_flipped:
          outf = None if out is None else (out + '_f')
          _flip = lambda v: vec(-v[0], v[1])
-         alpha_f, cost_f = relax_dir([_flip(v) for v in sysvs], mapvs,
+         alpha_f, cost_f = _relax_dir([_flip(v) for v in sysvs], mapvs,
             eps = eps/10.0, debug = outf, quiet = quiet)
 
          if cost_f < cost:
@@ -92,30 +164,68 @@ def ssys_relax( sys, quiet = True, graph = False ):
 
       if abs(alpha) > eps or flip != nop:
          func = lambda x: flip(x).rotate(alpha)
-         for e in T.findall('./spobs/spob'):
+         for e in spobs:
             spfil = spob_fil(nam2base(e.text))
-            p2 = fil_ET(spfil)
+            p2 = _get_spob(spfil)
             f = p2.getroot().find('pos')
-            vec_to_element(f, func(vec_from_element(f)))
-            p2.write(spfil)
+            p2.set_vec(f, func(vec_from_element(f)))
+            _spob_dirty[spfil] = p2
 
-         for i in ['./jumps/jump/pos', './asteroids/asteroid/pos', './waypoints/waypoint']:
-            for e in T.findall(i):
-               vec_to_element(e, func(vec_from_element(e)))
+         for e in positions:
+            p.set_vec(e, func(vec_from_element(e)))
          p.write(sys)
          return True
    return False
 
+# Worker side of the process pool. Spob writes are serialized.
+_write_lock = None
+
+def _init_worker( lock, smap ):
+   global _write_lock
+   _write_lock = lock
+   # Forked workers already share sm copy-on-write. Otherwise (e.g. spawn on
+   # Windows), they get the parent's pickled copy.
+   if smap is not sm:
+      sm.update(smap)
+
+def _relax_file( ssys, quiet = True, graph = False ):
+   deps = []
+   changed = ssys_relax(ssys, quiet = quiet, graph = graph, deps = deps)
+   with _write_lock:
+      _flush_spobs()
+   # Pool workers do not run atexit handlers.
+   repair_ET()
+   return changed, deps
+
+# Incremental mode: path -> {sha1 of the file after relax, map positions it
+# depends on}. Files for which both still match are skipped.
+CACHE = '.ssys_relax_cache.json'
+
+def _sha1( path ):
+   with open(path, 'rb') as fp:
+      return sha1(fp.read()).hexdigest()
+
+def _up_to_date( cache, path ):
+   if (ent := cache.get(realpath(path))) is None or ent['sha1'] != _sha1(path):
+      return False
+   return all(sm[n] is not None and list(sm[n]) == xy for n, xy in ent['map'].items())
+
 if __name__ == '__main__':
    from sys import argv, exit
-   from os import fork, wait
+   from concurrent.futures import ProcessPoolExecutor
+   from multiprocessing import get_context, get_all_start_methods
+   from functools import partial
+   from atexit import register
+   import json
    args = argv[1:]
-   jobs = 1
+   jobs = None
 
    if '-h' in args or '--help' in args or args == []:
-      stderr.write('usage:  ' + basename(argv[0]) + '[-j <n>]  [-v|-g]  <file1> ..\n')
+      stderr.write('usage:  ' + basename(argv[0]) + '[-j <n>]  [-v|-g]  [--no-cache]  <file1> ..\n')
       stderr.write('  Relaxes its input xml ssys files.\n')
-      stderr.write('  If -j is set, uses <n> processes.\n')
+      stderr.write('  Files unchanged since the last run, as recorded in ' + CACHE + ',\n')
+      stderr.write('  are skipped (and give no warnings), unless --no-cache, -v or -g is set.\n')
+      stderr.write('  Uses <n> processes if -j is set, one per cpu otherwise.\n')
       stderr.write('  If -v is set, display information.\n')
       stderr.write('  If -g is set, outputs the cost graph.\n')
       exit(0)
@@ -126,6 +236,12 @@ if __name__ == '__main__':
    if graph:= '-g' in args:
       args.remove('-g')
 
+   if no_cache:= '--no-cache' in args:
+      args.remove('--no-cache')
+
+   # These runs are about their output: don't skip anything.
+   no_cache = no_cache or verbose or graph
+
    if '-j' in args:
       i = args.index('-j')
       args.pop(i)
@@ -136,16 +252,39 @@ if __name__ == '__main__':
          stderr.write('-j: int expected after.\n')
          exit(1)
 
-   for i in range(jobs):
-      if fork() == 0:
-         for n, ssys in enumerate(args):
-            if n % jobs == i:
-               if ssys_relax(ssys, quiet = not verbose, graph = graph):
-                  print(ssys)
-                  stdout.flush()
-         exit(0)
-   try:
-      while wait() != -1:
+   cache = dict()
+   if not no_cache:
+      try:
+         with open(CACHE) as fp:
+            cache = json.load(fp)
+      except (OSError, ValueError):
          pass
-   except:
-      pass
+      args = [a for a in args if not _up_to_date(cache, a)]
+
+      def _save_cache():
+         with open(CACHE, 'w') as fp:
+            json.dump(cache, fp)
+      register(_save_cache)
+
+   # Load the starmap positions ssys_relax reads (each ssys and its frozen
+   # jump targets) once, before the workers are created.
+   for ssys in args:
+      T = parse_ET(ssys).getroot()
+      sm[nam2base(T.attrib['name'])]
+      for f, e in _ssys_elements(T)[0]:
+         if e is not None and 'was_auto' in e.attrib:
+            sm[nam2base(f.attrib['target'])]
+
+   ctx = get_context('fork' if 'fork' in get_all_start_methods() else None)
+   job = partial(_relax_file, quiet = not verbose, graph = graph)
+   with ProcessPoolExecutor(jobs, mp_context = ctx,
+         initializer = _init_worker, initargs = (ctx.Lock(), sm)) as ex:
+      for ssys, (changed, deps) in zip(args, ex.map(job, args)):
+         if changed:
+            print(ssys)
+            stdout.flush()
+         if not no_cache:
+            cache[realpath(ssys)] = {
+               'sha1': _sha1(ssys),
+               'map':  {n: list(sm[n]) for n in deps if sm[n] is not None},
+            }